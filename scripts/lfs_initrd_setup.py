@@ -12,15 +12,31 @@ installed kernel version under /lib/modules).
 from __future__ import annotations
 
 import argparse
+import bz2
+import functools
+import hashlib
+import http.client
+import io
 import os
+import re
+import shlex
 import shutil
 import subprocess
 import sys
 import tarfile
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
-from urllib.request import urlopen
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+try:  # Optional: reuse connections (HTTP/2 when h2 is installed) across downloads.
+    import httpx
+except ImportError:  # pragma: no cover - depends on the environment
+    httpx = None
 
 
 SCRIPT_ROOT = Path(__file__).resolve().parent
@@ -28,6 +44,46 @@ DEFAULT_CONFIG_DIR = SCRIPT_ROOT.parent / "configs"
 DEFAULT_BUSYBOX_CONFIG = DEFAULT_CONFIG_DIR / "busybox.config"
 DEFAULT_MKINITCPIO_CONFIG = DEFAULT_CONFIG_DIR / "mkinitcpio.conf"
 
+INITRD_RE = re.compile(r"^([ \t]*)initrd.*$", re.M)
+LINUX_RE = re.compile(r"^([ \t]*)linux.*$", re.M)
+COMPRESSION_RE = re.compile(r"^[ \t]*COMPRESSION=[\"']?(\w*)", re.M)
+COMPRESSION_OPTIONS_RE = re.compile(r"^[ \t]*COMPRESSION_OPTIONS=", re.M)
+
+# Copy member data in 1 MiB chunks rather than tarfile's 16 KiB default.
+TAR_COPY_BUFSIZE = 1 << 20
+# Use the "data" extraction filter explicitly where available (3.12+ and
+# security backports); relying on the default warns on 3.12+.
+EXTRACT_OPTIONS: Dict[str, str] = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+
+def _make_http_client(*, http2: bool) -> Any:
+    if httpx is None:
+        return None
+    # Sizes and byte ranges refer to the bytes on the wire, so never let the
+    # server apply a Content-Encoding.
+    options = dict(follow_redirects=True, timeout=60, headers={"Accept-Encoding": "identity"})
+    if http2:
+        try:
+            return httpx.Client(http2=True, **options)
+        except ImportError:  # http2 needs the optional h2 package
+            pass
+    return httpx.Client(**options)
+
+
+# Shared by every download thread so connections are pooled and reused.
+CLIENT = _make_http_client(http2=True)
+# HTTP/1.1 only, so concurrent range requests each get their own connection
+# instead of being multiplexed onto a single HTTP/2 stream.
+RANGE_CLIENT = _make_http_client(http2=False)
+
+# Error responses from either HTTP backend, and anything a transfer can raise.
+HTTP_STATUS_ERRORS: Tuple[type, ...] = (HTTPError,) + (
+    (httpx.HTTPStatusError,) if httpx is not None else ()
+)
+NETWORK_ERRORS: Tuple[type, ...] = (OSError, http.client.HTTPException) + (
+    (httpx.HTTPError,) if httpx is not None else ()
+)
+
 
 @dataclass
 class Package:
@@ -72,16 +128,50 @@ PACKAGES: Dict[str, Package] = {
 }
 
 
+@dataclass(frozen=True, slots=True)
+class SystemPaths:
+    """Locations inside the target system root, computed once per run."""
+
+    fstab: Path
+    grub_cfg: Path
+    mkinitcpio_conf: Path
+    modules_root: Path
+    boot_dir: Path
+    bin_dir: Path
+
+    @classmethod
+    def under(cls, system_root: Path) -> SystemPaths:
+        return cls(
+            fstab=system_root / "etc/fstab",
+            grub_cfg=system_root / "boot/grub/grub.cfg",
+            mkinitcpio_conf=system_root / "etc/mkinitcpio.conf",
+            modules_root=system_root / "lib/modules",
+            boot_dir=system_root / "boot",
+            bin_dir=system_root / "usr/bin",
+        )
+
+
 class CommandError(RuntimeError):
     pass
 
 
+class DownloadError(RuntimeError):
+    pass
+
+
+# Prefix for echoed commands, set per worker process when builds run concurrently.
+LOG_TAG = ""
+
+
 def run_command(
     cmd: Iterable[str], *, cwd: Optional[Path] = None, env: Optional[Dict[str, str]] = None
 ) -> None:
     """Execute a command while echoing it to stdout."""
-    printable = " ".join(cmd)
-    print(f"[CMD] {printable}")
+    cmd = list(cmd)
+    printable = shlex.join(cmd)
+    print(f"{LOG_TAG}[CMD] {printable}", flush=True)
+    # CPython 3.10+ launches these via vfork() even with cwd/env set, so the
+    # parent's page tables are never copied; posix_spawn cannot honour cwd.
     try:
         subprocess.run(cmd, cwd=cwd, env=env, check=True)
     except subprocess.CalledProcessError as exc:  # pragma: no cover - defensive
@@ -110,60 +200,377 @@ def prompt_for_confirmation() -> None:
         sys.exit("Aborted by user confirmation.")
 
 
-def download(package: Package, destination: Path) -> Path:
-    destination.mkdir(parents=True, exist_ok=True)
-    target = destination / package.filename
-    if target.exists():
-        print(f"[SKIP] {package.filename} already present")
-        return target
+def _extract_tar(tar: tarfile.TarFile, destination: Path) -> Optional[str]:
+    """Extract an open archive and return its top-level directory name.
 
-    print(f"[DL ] Downloading {package.url}")
-    with urlopen(package.url) as response, open(target, "wb") as handle:
-        shutil.copyfileobj(response, handle)
-    return target
+    The root directory is recorded while extractall() walks the members, so
+    the archive is only read once and streaming (non-seekable) archives work.
+    extractall() also defers directory modes and mtimes until every member
+    is written, so read-only directories do not block their own contents.
+    """
+    root_dir: Optional[str] = None
+
+    def members() -> Iterator[tarfile.TarInfo]:
+        nonlocal root_dir
+        for member in tar:
+            if root_dir is None and (member.isdir() or "/" in member.name):
+                root_dir = member.name.split("/", 1)[0]
+            yield member
+
+    tar.extractall(path=destination, members=members(), **EXTRACT_OPTIONS)
+    return root_dir
 
 
 def extract(archive: Path, destination: Path) -> Path:
     print(f"[EX ] Extracting {archive.name}")
     destination.mkdir(parents=True, exist_ok=True)
-    with tarfile.open(archive) as tar:
-        tar.extractall(path=destination)
-        members = [m for m in tar.getmembers() if m.isdir()]
+    with tarfile.open(archive, copybufsize=TAR_COPY_BUFSIZE) as tar:
+        root_dir = _extract_tar(tar, destination)
 
-    if members:
-        root_dir = sorted(members, key=lambda m: len(m.name.split("/")))[0].name.split("/")[0]
+    if root_dir:
         return destination / root_dir
 
     return destination / archive.stem
 
 
-def prepare_sources(workdir: Path, packages: Iterable[Package]) -> Dict[str, Path]:
-    """Download and extract the requested package sources."""
+class _TeeReader(io.RawIOBase):
+    """Copy everything read from ``source`` into ``sink`` as it passes through."""
+
+    def __init__(self, source: Any, sink: Any) -> None:
+        super().__init__()
+        self._source = source
+        self._sink = sink
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._source.read(len(buffer))
+        self._sink.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def checksum_path(archive: Path) -> Path:
+    """Location of the ``sha256sum``-format marker for a completed download."""
+    return archive.with_name(archive.name + ".sha256")
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _check_length(url: str, response: Any, received: int) -> None:
+    """Raise if fewer (or more) bytes arrived than the response announced."""
+    expected = response.headers.get("Content-Length")
+    if expected is not None and int(expected) != received:
+        raise DownloadError(f"Incomplete download of {url}: got {received} of {expected} bytes")
+
+
+def _finish_download(partial: Path, target: Path, digest: str) -> None:
+    """Move a verified download into place and record it as complete."""
+    os.replace(partial, target)
+    checksum_path(target).write_text(f"{digest}  {target.name}\n")
+
+
+def download_and_extract(package: Package, destination: Path, tarball_dir: Path) -> Path:
+    """Stream a package tarball into tarfile while caching it in ``tarball_dir``.
+
+    Extraction overlaps the transfer; the bytes are teed into a ``.part``
+    file that only replaces ``tarball_dir / package.filename`` on success.
+    """
+    print(f"[DL ] Streaming {package.url}")
+    destination.mkdir(parents=True, exist_ok=True)
+    tarball_dir.mkdir(parents=True, exist_ok=True)
+    target = tarball_dir / package.filename
+    partial = target.with_name(target.name + ".part")
+    try:
+        with open_url(package.url) as response, open(partial, "wb") as handle:
+            tee = _TeeReader(response, handle)
+            if package.filename.endswith((".tar.bz2", ".tbz2")):
+                # Compression auto-detection is unreliable on a non-seekable stream.
+                with bz2.open(tee) as stream, tarfile.open(
+                    fileobj=stream, mode="r|", copybufsize=TAR_COPY_BUFSIZE
+                ) as tar:
+                    root_dir = _extract_tar(tar, destination)
+            else:
+                with tarfile.open(fileobj=tee, mode="r|*", copybufsize=TAR_COPY_BUFSIZE) as tar:
+                    root_dir = _extract_tar(tar, destination)
+            # tarfile stops at the end-of-archive marker; keep the trailing bytes.
+            while tee.read(1 << 20):
+                pass
+            _check_length(package.url, response, tee.size)
+        _finish_download(partial, target, tee.digest.hexdigest())
+    except NETWORK_ERRORS as exc:
+        partial.unlink(missing_ok=True)
+        raise DownloadError(f"Failed to download {package.url}: {exc}") from exc
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+    if root_dir:
+        return destination / root_dir
+
+    return destination / Path(package.filename).stem
+
+
+class _HttpxReader(io.RawIOBase):
+    """Expose a streamed httpx response through the file API urlopen returns."""
+
+    def __init__(self, response: Any) -> None:
+        super().__init__()
+        self.status = response.status_code
+        self.headers = response.headers
+        self._url = str(response.url)
+        self._chunks = response.iter_raw(1 << 20)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def geturl(self) -> str:
+        return self._url
+
+    def readinto(self, buffer: Any) -> int:
+        if not self._pending:
+            self._pending = memoryview(next(self._chunks, b""))
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+@contextmanager
+def open_url(
+    url: str,
+    *,
+    method: str = "GET",
+    headers: Optional[Dict[str, str]] = None,
+    separate_connection: bool = False,
+) -> Iterator[Any]:
+    """Open ``url`` through the shared httpx client, or urllib without httpx.
+
+    ``separate_connection`` selects the HTTP/1.1 client so parallel requests
+    to one host are not multiplexed over a single connection.
+    """
+    if CLIENT is None:
+        with urlopen(Request(url, method=method, headers=headers or {})) as response:
+            yield response
+        return
+
+    client = RANGE_CLIENT if separate_connection else CLIENT
+    with client.stream(method, url, headers=headers) as response:
+        response.raise_for_status()
+        yield _HttpxReader(response)
+
+
+def _fetch_serial(url: str, target: Path) -> str:
+    """Download ``url`` into ``target`` and return its sha256 hex digest."""
+    with open_url(url) as response, open(target, "wb") as handle:
+        tee = _TeeReader(response, handle)
+        while tee.read(1 << 20):
+            pass
+        _check_length(url, response, tee.size)
+    return tee.digest.hexdigest()
+
+
+def _fetch_range(url: str, fd: int, lo: int, hi: int, length: int) -> bool:
+    """Write bytes ``lo``-``hi`` of ``url`` at the same offsets in ``fd``.
+
+    Returns False unless the server answered with exactly the requested range
+    and delivered all of it, so callers never keep a file with holes.  Error
+    statuses (e.g. 416) also return False so the caller can fall back.
+    """
+    headers = {"Range": f"bytes={lo}-{hi}"}
+    try:
+        with open_url(url, headers=headers, separate_connection=True) as response:
+            if response.status != 206:
+                return False
+            if response.headers.get("Content-Range") not in (
+                f"bytes {lo}-{hi}/{length}",
+                f"bytes {lo}-{hi}/*",
+            ):
+                return False
+            offset = lo
+            while offset <= hi:
+                data = response.read(min(1 << 20, hi + 1 - offset))
+                if not data:
+                    break
+                os.pwrite(fd, data, offset)
+                offset += len(data)
+    except HTTP_STATUS_ERRORS:
+        return False
+    return offset == hi + 1
+
+
+def remote_size(url: str) -> Tuple[int, str]:
+    """Return the Content-Length (0 if unknown) and final URL after redirects.
+
+    Servers that reject HEAD (405, 403, ...) are treated as reporting no size.
+    """
+    try:
+        with open_url(url, method="HEAD") as response:
+            return int(response.headers.get("Content-Length") or 0), response.geturl()
+    except HTTP_STATUS_ERRORS:
+        return 0, url
+
+
+def cached_archive_valid(archive: Path) -> bool:
+    """Check a cached tarball against the checksum recorded when it downloaded.
+
+    Only archives whose contents hash to the value in their ``.sha256``
+    marker are trusted, so a truncated or zero-filled file of the right size
+    is never reused.  Corrupt archives are removed.
+    """
+    marker = checksum_path(archive)
+    if not marker.exists():
+        print(f"[INFO] {archive.name} has no {marker.name}; re-downloading")
+        return False
+    recorded = marker.read_text().split()
+    if not recorded or _file_digest(archive) != recorded[0]:
+        print(f"[WARN] {archive.name} does not match {marker.name}; re-downloading")
+        archive.unlink()
+        marker.unlink()
+        return False
+    return True
+
+
+def parallel_download(url: str, target: Path, streams: int = 1) -> None:
+    """Fetch ``url`` into ``target`` using ``streams`` concurrent byte ranges.
+
+    Falls back to a single-stream download when the size is unknown or the
+    server ignores or rejects the Range header.  Transfer failures are raised
+    as DownloadError.
+    """
+    partial = target.with_name(target.name + ".part")
+    try:
+        length, url = remote_size(url)
+
+        if streams < 2 or length < streams:
+            digest = _fetch_serial(url, partial)
+        else:
+            chunk = -(-length // streams)
+            ranges = [(lo, min(lo + chunk, length) - 1) for lo in range(0, length, chunk)]
+            fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.ftruncate(fd, length)
+
+                with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                    futures = [executor.submit(_fetch_range, url, fd, lo, hi, length) for lo, hi in ranges]
+                    ranged = all([future.result() for future in futures])
+            finally:
+                os.close(fd)
+            if ranged:
+                digest = _file_digest(partial)
+            else:
+                print(f"[WARN] Range requests to {url} failed or were incomplete; downloading serially")
+                digest = _fetch_serial(url, partial)
+        _finish_download(partial, target, digest)
+    except NETWORK_ERRORS as exc:
+        partial.unlink(missing_ok=True)
+        raise DownloadError(f"Failed to download {url}: {exc}") from exc
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+
+def download(package: Package, destination: Path, streams: int = 1) -> Path:
+    destination.mkdir(parents=True, exist_ok=True)
+    target = destination / package.filename
+    print(f"[DL ] Downloading {package.url} ({streams} streams)")
+    parallel_download(package.url, target, streams)
+    return target
+
+
+def prepare_sources(
+    workdir: Path, packages: Iterable[Package], *, streams: int = 1
+) -> Dict[str, Path]:
+    """Download and extract the requested package sources.
+
+    Tarballs already cached under ``workdir/sources`` are checked against
+    the checksum recorded when they were downloaded and extracted from
+    disk.  Otherwise, with a single stream the tarball is piped from its
+    mirror into the build tree while being cached; with more, it is first
+    fetched to ``workdir/sources`` over parallel range requests.
+    """
+    packages = list(packages)
     sources: Dict[str, Path] = {}
     tarball_dir = workdir / "sources"
     build_dir = workdir / "build"
-    for pkg in packages:
-        archive = download(pkg, tarball_dir)
-        source_root = extract(archive, build_dir)
-        sources[pkg.name] = source_root
-    return sources
-
-
-def build_libarchive(source: Path, jobs: int, *, destdir: Optional[Path] = None) -> None:
+    if not packages:
+        return sources
+
+    # Handle every package concurrently: downloads wait on the network, and
+    # hashing and decompressing cached archives run in hashlib/zlib/bz2 code
+    # that releases the GIL, so several archives proceed in parallel.  Each
+    # worker owns its own TarFile, so extraction can proceed as bytes arrive.
+    def fetch(pkg: Package) -> Path:
+        archive = tarball_dir / pkg.filename
+        if archive.exists() and cached_archive_valid(archive):
+            print(f"[SKIP] {pkg.filename} already present")
+            return extract(archive, build_dir)
+        if streams > 1:
+            return extract(download(pkg, tarball_dir, streams), build_dir)
+        return download_and_extract(pkg, build_dir, tarball_dir)
+
+    with ThreadPoolExecutor(max_workers=min(len(packages), 8)) as executor:
+        futures = {executor.submit(fetch, pkg): pkg for pkg in packages}
+        for future in as_completed(futures):
+            sources[futures[future].name] = future.result()
+
+    # Preserve the package order callers passed in.
+    return {pkg.name: sources[pkg.name] for pkg in packages}
+
+
+def make_env(jobs: Optional[int] = None, *, ccache: bool = False) -> Dict[str, str]:
+    """Environment for configure and make steps.
+
+    With ``jobs`` set, MAKEFLAGS carries ``-j{jobs}`` so recursive sub-makes
+    of the compile step run in parallel too; install and clean steps leave
+    it unset so they stay serial.  The explicit ``-j`` passed to the
+    top-level make still takes precedence, so ``--jobs 1`` keeps the whole
+    build serial.  With ``ccache`` set and ccache on PATH, CC and CXX are
+    wrapped so re-runs reuse cached objects.
+    """
+    env = os.environ.copy()
+    if jobs is not None:
+        env["MAKEFLAGS"] = f"-j{jobs}"
+    if ccache and "ccache" in path_executables():
+        for var, default in (("CC", "cc"), ("CXX", "c++")):
+            compiler = env.get(var, default)
+            if not compiler.startswith("ccache"):
+                env[var] = f"ccache {compiler}"
+    return env
+
+
+def build_libarchive(
+    source: Path, jobs: int, *, destdir: Optional[Path] = None, ccache: bool = True
+) -> None:
     configure_cmd = [
         str(source / "configure"),
         "--prefix=/usr",
         "--disable-static",
     ]
-    run_command(configure_cmd, cwd=source)
-    run_command(["make", f"-j{jobs}"], cwd=source)
+    env = make_env(ccache=ccache)
+    run_command(configure_cmd, cwd=source, env=env)
+    run_command(["make", f"-j{jobs}"], cwd=source, env=make_env(jobs, ccache=ccache))
     install_cmd: List[str] = ["make", "install"]
     if destdir is not None:
         install_cmd.append(f"DESTDIR={destdir}")
-    run_command(install_cmd, cwd=source)
+    run_command(install_cmd, cwd=source, env=env)
 
 
-def build_util_linux(source: Path, jobs: int, *, destdir: Optional[Path] = None) -> None:
+def build_util_linux(
+    source: Path, jobs: int, *, destdir: Optional[Path] = None, ccache: bool = True
+) -> None:
     build_dir = source / "build"
     build_dir.mkdir(exist_ok=True)
     configure_cmd = [
@@ -180,12 +587,13 @@ def build_util_linux(source: Path, jobs: int, *, destdir: Optional[Path] = None)
         "--enable-chfn-chsh",
         "--with-systemdsystemunitdir=/usr/lib/systemd/system"
     ]
-    run_command(configure_cmd, cwd=build_dir)
-    run_command(["make", f"-j{jobs}"], cwd=build_dir)
+    env = make_env(ccache=ccache)
+    run_command(configure_cmd, cwd=build_dir, env=env)
+    run_command(["make", f"-j{jobs}"], cwd=build_dir, env=make_env(jobs, ccache=ccache))
     install_cmd: List[str] = ["make", "install"]
     if destdir is not None:
         install_cmd.append(f"DESTDIR={destdir}")
-    run_command(install_cmd, cwd=build_dir)
+    run_command(install_cmd, cwd=build_dir, env=env)
 
 
 def build_busybox(
@@ -194,55 +602,198 @@ def build_busybox(
     if not config_file.exists():
         raise FileNotFoundError(f"BusyBox config not found: {config_file}")
 
-    run_command(["make", "distclean"], cwd=source)
+    # A freshly extracted tree has nothing to clean.
+    if (source / ".config").exists() or any(source.rglob("*.o")):
+        run_command(["make", "distclean"], cwd=source)
     shutil.copy2(config_file, source / ".config")
-    run_command(["make", f"-j{jobs}"], cwd=source)
+    run_command(["make", f"-j{jobs}"], cwd=source, env=make_env(jobs))
     config_prefix = Path("/usr") if destdir is None else destdir / "usr"
     run_command(["make", f"CONFIG_PREFIX={config_prefix}", "install"], cwd=source)
 
 
+def scratch_build_dir(source: Path, *, min_free: int = 256 << 20) -> Optional[Path]:
+    """Create a meson build directory on tmpfs under /dev/shm, if suitable.
+
+    Returns None (build in-tree instead) when /dev/shm is missing, mounted
+    noexec, has less than ``min_free`` bytes available, or already backs the
+    source tree.
+    """
+    shm = Path("/dev/shm")
+    try:
+        stats = os.statvfs(shm)
+        on_shm = os.stat(source).st_dev == os.stat(shm).st_dev
+    except OSError:
+        return None
+    if on_shm or stats.f_flag & os.ST_NOEXEC or stats.f_bavail * stats.f_frsize < min_free:
+        return None
+    return Path(tempfile.mkdtemp(prefix="mkinitcpio-build-", dir=shm))
+
+
 def build_mkinitcpio(source: Path, jobs: int, *, destdir: Optional[Path] = None) -> None:
-    build_dir = source / "build"
+    scratch = scratch_build_dir(source)
+    build_dir = scratch or source / "build"
     build_dir.mkdir(exist_ok=True)
-    run_command(["meson", "setup", "--prefix=/usr", "--buildtype=release", str(build_dir)], cwd=source)
-    run_command(["meson", "compile", "-C", str(build_dir), f"-j{jobs}"], cwd=source)
-    install_cmd = ["meson", "install", "-C", str(build_dir)]
-    if destdir is not None:
-        install_cmd.extend(["--destdir", str(destdir)])
-    run_command(install_cmd, cwd=source)
+    try:
+        run_command(["meson", "setup", "--prefix=/usr", "--buildtype=release", str(build_dir)], cwd=source)
+        run_command(["meson", "compile", "-C", str(build_dir), f"-j{jobs}"], cwd=source)
+        install_cmd = ["meson", "install", "-C", str(build_dir)]
+        if destdir is not None:
+            install_cmd.extend(["--destdir", str(destdir)])
+        run_command(install_cmd, cwd=source)
+    except CommandError:
+        if scratch is not None:
+            print(f"[WARN] Keeping mkinitcpio build directory {scratch} (see meson-logs/meson-log.txt)")
+        raise
+    if scratch is not None:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def run_tagged(tag: str, func: Callable[..., None], *args: Any, **kwargs: Any) -> None:
+    """Run a build step in a worker process, tagging its echoed commands."""
+    global LOG_TAG
+    LOG_TAG = f"[{tag}] "
+    func(*args, **kwargs)
+
+
+def build_independent(builds: Dict[str, Callable[[int], None]], jobs: int) -> None:
+    """Build packages without mutual dependencies concurrently.
+
+    ``builds`` maps a log tag to a picklable callable taking the job count;
+    the available jobs are split evenly so make is not oversubscribed.
+    """
+    if len(builds) < 2:
+        for build in builds.values():
+            build(jobs)
+        return
 
+    jobs_each = max(1, jobs // len(builds))
+    with ProcessPoolExecutor(max_workers=len(builds)) as executor:
+        futures = [executor.submit(run_tagged, tag, build, jobs_each) for tag, build in builds.items()]
+        for future in futures:
+            future.result()
 
-def libarchive_installed() -> bool:
+
+PKG_CONFIG_MODULES = ("libarchive", "ncurses", "zlib")
+
+
+def _pkg_config_exists(*modules: str) -> bool:
     try:
-        subprocess.run(["pkg-config", "--exists", "libarchive"], check=True)
+        subprocess.run(["pkg-config", "--exists", *modules], check=True)
     except (FileNotFoundError, subprocess.CalledProcessError):
         return False
     return True
 
 
-def install_mkinitcpio_config(config_file: Path, system_root: Path) -> Path:
+@functools.lru_cache(maxsize=1)
+def probe_prereqs() -> Dict[str, bool]:
+    """Report which PKG_CONFIG_MODULES are installed.
+
+    A single ``pkg-config --exists`` covers the common case where all are
+    present; modules are only probed individually when that fails.
+    """
+    if _pkg_config_exists(*PKG_CONFIG_MODULES):
+        return {module: True for module in PKG_CONFIG_MODULES}
+    return {module: _pkg_config_exists(module) for module in PKG_CONFIG_MODULES}
+
+
+def libarchive_installed() -> bool:
+    return probe_prereqs()["libarchive"]
+
+
+@functools.lru_cache(maxsize=1)
+def path_executables() -> FrozenSet[str]:
+    """Return every file name found on PATH, gathered in a single listing pass.
+
+    The result is cached, so only call this once the tools being looked up
+    are expected to be installed.
+    """
+    names = set()
+    for directory in os.environ.get("PATH", os.defpath).split(os.pathsep):
+        try:
+            names.update(os.listdir(directory or "."))
+        except OSError:
+            continue
+    return frozenset(names)
+
+
+def backup_file(source: Path, backup: Path) -> None:
+    """Back up ``source`` as a hardlink, copying only if linking is not possible.
+
+    Callers must replace ``source`` with a new inode (see ``replace_file``)
+    rather than rewriting it in place, or the backup would change too.
+    """
+    try:
+        os.link(source, backup)
+    except OSError:
+        shutil.copy2(source, backup)
+
+
+def replace_file(
+    destination: Path, *, content: Optional[str] = None, source: Optional[Path] = None
+) -> None:
+    """Atomically replace ``destination`` with ``content`` or a copy of ``source``."""
+    staging = destination.with_name(destination.name + ".tmp")
+    if source is not None:
+        shutil.copy2(source, staging)
+    else:
+        staging.write_text(content or "")
+        if destination.exists():
+            shutil.copymode(destination, staging)
+    os.replace(staging, destination)
+
+
+def install_mkinitcpio_config(config_file: Path, paths: SystemPaths) -> Path:
     if not config_file.exists():
         raise FileNotFoundError(f"mkinitcpio config not found: {config_file}")
 
-    destination = system_root / "etc/mkinitcpio.conf"
+    destination = paths.mkinitcpio_conf
     destination.parent.mkdir(parents=True, exist_ok=True)
     backup = destination.with_suffix(destination.suffix + ".bak")
     if destination.exists() and not backup.exists():
-        shutil.copy2(destination, backup)
+        backup_file(destination, backup)
         print(f"[INFO] Existing mkinitcpio.conf backed up to {backup}")
 
-    shutil.copy2(config_file, destination)
+    replace_file(destination, source=config_file)
     print(f"[INFO] Installed mkinitcpio.conf from {config_file}")
     return destination
 
 
-def detect_kernel_version(system_root: Path) -> str:
-    modules_root = system_root / "lib/modules"
+def prefer_parallel_compression(mkinitcpio_conf: Path) -> None:
+    """Make the installed mkinitcpio.conf compress with multi-threaded zstd.
+
+    Configurations that already set COMPRESSION_OPTIONS, or that pick a
+    compressor other than zstd, are left untouched.
+    """
+    content = mkinitcpio_conf.read_text()
+    if COMPRESSION_OPTIONS_RE.search(content):
+        return
+    compression = COMPRESSION_RE.search(content)
+    if compression and compression.group(1) != "zstd":
+        return
+
+    additions = ["", "# Added by lfs_initrd_setup.py: compress with zstd on all cores"]
+    if compression is None:
+        additions.append('COMPRESSION="zstd"')
+    additions.append("COMPRESSION_OPTIONS=(-T0)")
+    with open(mkinitcpio_conf, "a") as handle:
+        if content and not content.endswith("\n"):
+            handle.write("\n")
+        handle.write("\n".join(additions) + "\n")
+    print("[INFO] Enabled multi-threaded zstd compression in mkinitcpio.conf")
+
+
+def version_key(name: str) -> Tuple[Tuple[int, str], ...]:
+    """Sort key comparing kernel release components numerically (6.10 > 6.9)."""
+    return tuple((int(part), "") if part.isdigit() else (-1, part) for part in re.split(r"[.\-]", name))
+
+
+def detect_kernel_version(paths: SystemPaths) -> str:
+    modules_root = paths.modules_root
     if modules_root.exists():
-        candidates = [d.name for d in modules_root.iterdir() if d.is_dir()]
+        with os.scandir(modules_root) as entries:
+            candidates = [entry.name for entry in entries if entry.is_dir()]
         if candidates:
-            candidates.sort()
-            kernel = candidates[-1]
+            kernel = max(candidates, key=version_key)
             print(f"[INFO] Detected kernel version {kernel} from /lib/modules")
             return kernel
 
@@ -254,17 +805,16 @@ def detect_kernel_version(system_root: Path) -> str:
 def build_initrd(
     kernel: str,
     mkinitcpio_conf: Path,
-    system_root: Path,
+    paths: SystemPaths,
     *,
     fake: bool,
 ) -> Path:
-    initrd_path = system_root / f"boot/initrd.img-{kernel}"
+    initrd_path = paths.boot_dir / f"initrd.img-{kernel}"
     initrd_path.parent.mkdir(parents=True, exist_ok=True)
     env = None
     if fake:
         env = os.environ.copy()
-        fake_path = system_root / "usr/bin"
-        env["PATH"] = f"{fake_path}:{env.get('PATH', '')}"
+        env["PATH"] = f"{paths.bin_dir}:{env.get('PATH', '')}"
     run_command(
         [
             "mkinitcpio",
@@ -281,8 +831,8 @@ def build_initrd(
     return initrd_path
 
 
-def update_grub_cfg(initrd_path: Path, kernel: str, system_root: Path) -> None:
-    grub_cfg = system_root / "boot/grub/grub.cfg"
+def update_grub_cfg(initrd_path: Path, kernel: str, paths: SystemPaths) -> None:
+    grub_cfg = paths.grub_cfg
     if not grub_cfg.exists():
         print("[WARN] GRUB configuration not found. Please ensure GRUB is installed per the LFS/BLFS book.")
         return
@@ -290,104 +840,85 @@ def update_grub_cfg(initrd_path: Path, kernel: str, system_root: Path) -> None:
     original = grub_cfg.read_text()
     backup = grub_cfg.with_suffix(".bak")
     if not backup.exists():
-        shutil.copy2(grub_cfg, backup)
+        backup_file(grub_cfg, backup)
         print(f"[INFO] Backed up grub.cfg to {backup}")
 
-    new_lines: List[str] = []
-    replacement_done = False
-    for line in original.splitlines():
-        if line.strip().startswith("initrd"):
-            indent = line[: len(line) - len(line.lstrip())]
-            new_lines.append(f"{indent}initrd {initrd_path}")
-            replacement_done = True
-        else:
-            new_lines.append(line)
-
-    if not replacement_done:
+    updated, replaced = INITRD_RE.subn(lambda m: f"{m.group(1)}initrd {initrd_path}", original)
+    if not replaced:
         # Append to the first linux entry
-        appended = False
-        rewritten: List[str] = []
-        for line in new_lines:
-            rewritten.append(line)
-            if line.strip().startswith("linux") and not appended:
-                indent = line[: len(line) - len(line.lstrip())]
-                rewritten.append(f"{indent}initrd {initrd_path}")
-                appended = True
-        new_lines = rewritten
-
-    grub_cfg.write_text("\n".join(new_lines) + "\n")
+        updated = LINUX_RE.sub(
+            lambda m: f"{m.group(0)}\n{m.group(1)}initrd {initrd_path}", original, count=1
+        )
+
+    if not updated.endswith("\n"):
+        updated += "\n"
+    replace_file(grub_cfg, content=updated)
     print(f"[INFO] Updated {grub_cfg} to use {initrd_path.name}")
 
 
-@dataclass
-class FstabEntry:
+class FstabEntry(NamedTuple):
     device: str
     uuid: str
     fstype: str
     mountpoint: str
 
     def to_line(self) -> str:
-        options = "defaults"
         if self.fstype == "swap" or self.mountpoint == "swap":
             return f"UUID={self.uuid}\tswap\tswap\tpri=0\t0\t0"
 
-        dump = "1" if self.mountpoint == "/" else "0"
-        passno = "1" if self.mountpoint == "/" else "2"
-        return f"UUID={self.uuid}\t{self.mountpoint}\t{self.fstype}\t{options}\t{dump}\t{passno}"
+        dump_passno = "1\t1" if self.mountpoint == "/" else "0\t2"
+        return f"UUID={self.uuid}\t{self.mountpoint}\t{self.fstype}\tdefaults\t{dump_passno}"
 
 
-def rebuild_fstab(system_root: Path) -> None:
-    existing = system_root / "etc/fstab"
+def rebuild_fstab(paths: SystemPaths) -> None:
+    existing = paths.fstab
     existing.parent.mkdir(parents=True, exist_ok=True)
     backup = existing.with_suffix(".bak")
     if existing.exists() and not backup.exists():
-        shutil.copy2(existing, backup)
+        backup_file(existing, backup)
         print(f"[INFO] Backed up fstab to {backup}")
 
-    try:
-        result = subprocess.run(
-            ["lsblk", "-pnro", "NAME,UUID,FSTYPE,MOUNTPOINT"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-    except subprocess.CalledProcessError:
+    entries: List[FstabEntry] = []
+    # Parse lsblk output line by line as it is produced rather than buffering it.
+    with subprocess.Popen(
+        ["lsblk", "-pnro", "NAME,UUID,FSTYPE,MOUNTPOINT"],
+        stdout=subprocess.PIPE,
+        text=True,
+    ) as proc:
+        for raw in proc.stdout:
+            parts = raw.rstrip().split(None, 3)
+            if len(parts) < 4:
+                continue
+            name, uuid, fstype, mountpoint = parts
+            if not uuid:
+                continue
+            if mountpoint == "[SWAP]" or fstype == "swap":
+                entries.append(FstabEntry(name, uuid, "swap", "swap"))
+                continue
+            if not mountpoint or mountpoint == "-":
+                continue
+            entries.append(FstabEntry(name, uuid, fstype or "auto", mountpoint))
+
+    if proc.returncode != 0:
         print("[WARN] Unable to query block devices with lsblk; skipping fstab regeneration.")
         return
 
-    entries: List[FstabEntry] = []
-    for raw in result.stdout.strip().splitlines():
-        parts = raw.split(None, 3)
-        if len(parts) < 4:
-            continue
-        name, uuid, fstype, mountpoint = (part.strip() for part in parts)
-        if not uuid:
-            continue
-        if mountpoint == "[SWAP]" or fstype == "swap":
-            entries.append(FstabEntry(name, uuid, "swap", "swap"))
-            continue
-        if not mountpoint or mountpoint == "-":
-            continue
-        entries.append(FstabEntry(name, uuid, fstype or "auto", mountpoint))
-
     if not entries:
         print("[WARN] No mounted devices discovered; skipping fstab regeneration.")
         return
 
     new_content = (
         "# Generated by lfs_initrd_setup.py\n"
-        + "\n".join(entry.to_line() for entry in entries)
+        + "\n".join([entry.to_line() for entry in entries])
         + "\n"
     )
-    existing.write_text(new_content)
+    replace_file(existing, content=new_content)
     print("[INFO] Regenerated /etc/fstab using UUIDs")
 
 
-def check_grub_installation(system_root: Path) -> None:
-    grub_cfg = system_root / "boot/grub/grub.cfg"
-    grub_dir = grub_cfg.parent if grub_cfg.exists() else system_root / "boot/grub"
-    grub_install = shutil.which("grub-install")
-    if not grub_dir.exists() or grub_install is None:
+def check_grub_installation(paths: SystemPaths) -> None:
+    grub_dir = paths.grub_cfg.parent
+    if not grub_dir.exists() or "grub-install" not in path_executables():
         print("[WARN] GRUB installation not detected. Please consult the LFS/BLFS book and install GRUB before running this script again.")
 
 
@@ -397,6 +928,18 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument("--jobs", type=int, default=os.cpu_count() or 2, help="Number of make jobs")
     parser.add_argument("--busybox-config", type=Path, default=DEFAULT_BUSYBOX_CONFIG, help="Path to BusyBox .config file")
     parser.add_argument("--mkinitcpio-config", type=Path, default=DEFAULT_MKINITCPIO_CONFIG, help="Path to mkinitcpio.conf")
+    parser.add_argument(
+        "--download-streams",
+        type=int,
+        default=1,
+        help="Parallel HTTP range requests per tarball (1 streams the download straight into tar)",
+    )
+    parser.add_argument(
+        "--no-ccache",
+        dest="ccache",
+        action="store_false",
+        help="Do not wrap CC/CXX with ccache when building util-linux and libarchive",
+    )
     parser.add_argument("--skip-download", action="store_true", help="Skip downloading and extracting sources")
     parser.add_argument("--skip-build", action="store_true", help="Skip building packages")
     parser.add_argument("--skip-initrd", action="store_true", help="Skip creating initramfs and updating bootloader")
@@ -417,8 +960,12 @@ def main() -> None:
     system_root = args.workdir / "fake_root" if args.fake else Path("/")
     if args.fake:
         system_root.mkdir(parents=True, exist_ok=True)
+    paths = SystemPaths.under(system_root)
 
     needs_libarchive_build = args.fake or not libarchive_installed()
+    for module in ("ncurses", "zlib"):
+        if not probe_prereqs()[module]:
+            print(f"[WARN] pkg-config could not find {module}; util-linux and libarchive may build without it")
     packages_to_prepare = [
         pkg
         for pkg in PACKAGES.values()
@@ -428,7 +975,7 @@ def main() -> None:
     sources = {}
     if not args.skip_download:
         print("\n[STEP 1] Preparing package sources (download & extract)")
-        sources = prepare_sources(args.workdir, packages_to_prepare)
+        sources = prepare_sources(args.workdir, packages_to_prepare, streams=args.download_streams)
     else:
         print("\n[STEP 1] Skipping source downloads (verification only)")
         build_root = args.workdir / "build"
@@ -441,37 +988,46 @@ def main() -> None:
     if not args.skip_build:
         print("\n[STEP 2] Building required packages")
         destdir = system_root if args.fake else None
+        # libarchive and util-linux do not depend on each other, so build them together.
+        independent = {
+            "util-linux": functools.partial(
+                build_util_linux, sources["util-linux"], destdir=destdir, ccache=args.ccache
+            ),
+        }
         if needs_libarchive_build:
             print("[INFO] libarchive not detected; building from source")
-            build_libarchive(sources["libarchive"], args.jobs, destdir=destdir)
+            independent["libarchive"] = functools.partial(
+                build_libarchive, sources["libarchive"], destdir=destdir, ccache=args.ccache
+            )
         else:
             print("[SKIP] libarchive already installed; skipping build")
-        build_util_linux(sources["util-linux"], args.jobs, destdir=destdir)
+        build_independent(independent, args.jobs)
         build_busybox(sources["busybox"], args.jobs, args.busybox_config, destdir=destdir)
         build_mkinitcpio(sources["mkinitcpio"], args.jobs, destdir=destdir)
     else:
         print("\n[STEP 2] Package build skipped")
 
     print("\n[STEP 3] Installing mkinitcpio configuration")
-    mkinitcpio_conf = install_mkinitcpio_config(args.mkinitcpio_config, system_root)
+    mkinitcpio_conf = install_mkinitcpio_config(args.mkinitcpio_config, paths)
+    prefer_parallel_compression(mkinitcpio_conf)
     print("\n[STEP 4] Verifying GRUB installation")
-    check_grub_installation(system_root)
+    check_grub_installation(paths)
 
     if not args.skip_initrd:
         print("\n[STEP 5] Generating initramfs and updating GRUB")
-        kernel_version = detect_kernel_version(system_root)
-        initrd = build_initrd(kernel_version, mkinitcpio_conf, system_root, fake=args.fake)
-        update_grub_cfg(initrd, kernel_version, system_root)
+        kernel_version = detect_kernel_version(paths)
+        initrd = build_initrd(kernel_version, mkinitcpio_conf, paths, fake=args.fake)
+        update_grub_cfg(initrd, kernel_version, paths)
     else:
         print("\n[STEP 5] Initramfs generation skipped")
 
     print("\n[STEP 6] Regenerating /etc/fstab entries")
-    rebuild_fstab(system_root)
+    rebuild_fstab(paths)
     print("[DONE] All tasks completed.")
 
 
 if __name__ == "__main__":
     try:
         main()
-    except (CommandError, FileNotFoundError) as exc:
+    except (CommandError, DownloadError, FileNotFoundError) as exc:
         sys.exit(str(exc))